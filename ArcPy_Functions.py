@@ -1,9 +1,24 @@
 import arcpy
 import arcpy.management
 import pandas as pd
-import math
+import numpy as np
 import os
 
+# arcpy.ListFields field types -> field types accepted by arcpy.management.AddFields
+_FIELD_TYPES = {"String": "TEXT",
+                "Single": "FLOAT",
+                "Double": "DOUBLE",
+                "SmallInteger": "SHORT",
+                "Integer": "LONG",
+                "BigInteger": "BIGINTEGER",
+                "Date": "DATE",
+                "DateOnly": "DATEONLY",
+                "TimeOnly": "TIMEONLY",
+                "TimestampOffset": "TIMESTAMPOFFSET",
+                "Blob": "BLOB",
+                "Raster": "RASTER",
+                "Guid": "GUID"}
+
 
 def get_bbox(fc, feature_index=None):
     """
@@ -11,23 +26,31 @@ def get_bbox(fc, feature_index=None):
 
     Args:
         fc: Polygon feature class
-        feature_index: the index value of the polygon fc. Used for looping through the fc.
+        feature_index: the Object ID of a feature in the polygon fc. Used for looping through the fc.
+            If not given, the bounding box of the whole fc is returned.
 
     Returns: List of values [minx, miny, maxx, maxy]
 
     """
-    with arcpy.da.SearchCursor(fc, ["SHAPE@"]) as cursor:
-        for i, row in enumerate(cursor):
-            if feature_index:
-                if i == feature_index:
-                    extent = row[0].extent
-                    minx, maxx, miny, maxy = extent.XMin, extent.XMax, extent.YMin, extent.YMax
-                    return [minx, miny, maxx, maxy]
+    desc = arcpy.Describe(fc)
+    if feature_index is None:
+        extent = desc.extent
+        return [extent.XMin, extent.YMin, extent.XMax, extent.YMax]
+
+    # Only fetch the requested feature rather than walking the cursor up to it
+    where = f"{arcpy.AddFieldDelimiters(fc, desc.OIDFieldName)} = {int(feature_index)}"
+    with arcpy.da.SearchCursor(fc, ["SHAPE@"], where_clause=where) as cursor:
+        for row in cursor:
+            extent = row[0].extent
+            minx, maxx, miny, maxy = extent.XMin, extent.XMax, extent.YMin, extent.YMax
+            return [minx, miny, maxx, maxy]
 
 def scale_geom(geom, scale, reference=None):
     """
     Returns geom scaled to scale %
     Source: User Evil Genius via https://gis.stackexchange.com/questions/169694/polygon-resizing-in-arcpy-like-scale-tool-of-advanced-editing-toolbar-in-arcmap
+    The source recovers each vertex's angle with the Law of Cosines and rotates a scaled distance back into place,
+    which is the same as moving each vertex along its offset (dx, dy) from the reference point.
     
     """
     if geom is None: return None
@@ -35,41 +58,33 @@ def scale_geom(geom, scale, reference=None):
         # we'll use the centroid if no reference point is given
         reference = geom.centroid
 
-    refgeom = arcpy.PointGeometry(reference)
+    # Bind lookups used for every vertex to locals
+    _Point = arcpy.Point
+    refx, refy = reference.X, reference.Y
+
+    part_count = geom.partCount
     newparts = []
-    for pind in range(geom.partCount):
+    for pind in range(part_count):
         part = geom.getPart(pind)
-        newpart = []
-        for ptind in range(part.count):
-            apnt = part.getObject(ptind)
-            if apnt is None:
-                # polygon boundaries and holes are all returned in the same part.
-                # A null point separates each ring, so just pass it on to
-                # preserve the holes.
-                newpart.append(apnt)
-                continue
-            bdist = refgeom.distanceTo(apnt)
-
-            bpnt = arcpy.Point(reference.X + bdist, reference.Y)
-            adist = refgeom.distanceTo(bpnt)
-            cdist = arcpy.PointGeometry(apnt).distanceTo(bpnt)
-
-            # Law of Cosines, angle of C given lengths of a, b and c
-            angle = math.acos((adist**2 + bdist**2 - cdist**2) / (2 * adist * bdist))
-
-            scaledist = bdist * scale
-
-            # If the point is below the reference point then our angle
-            # is actually negative
-            if apnt.Y < reference.Y: angle = angle * -1
-
-            # Create a new point that is scaledist from the origin 
-            # along the x axis. Rotate that point the same amount 
-            # as the original then translate it to the reference point
-            scalex = scaledist * math.cos(angle) + reference.X
-            scaley = scaledist * math.sin(angle) + reference.Y
-
-            newpart.append(arcpy.Point(scalex, scaley))
+        # Fetch each vertex from the arcpy.Array once, everything below works off this list
+        point_count = part.count
+        get_point = part.getObject
+        pnts = [get_point(ptind) for ptind in range(point_count)]
+        # polygon boundaries and holes are all returned in the same part.
+        # A null point separates each ring, so only the real vertices are scaled
+        # and the nulls are left in place to preserve the holes.
+        valid = [ptind for ptind, apnt in enumerate(pnts) if apnt is not None]
+        xs = np.array([pnts[ptind].X for ptind in valid], dtype=np.float64)
+        ys = np.array([pnts[ptind].Y for ptind in valid], dtype=np.float64)
+
+        # Scaling a vertex away from the reference point is linear in its offset,
+        # so the whole part can be done in one vectorized pass.
+        scalex = refx + scale * (xs - refx)
+        scaley = refy + scale * (ys - refy)
+
+        newpart = [None] * point_count
+        for ptind, x, y in zip(valid, scalex.tolist(), scaley.tolist()):
+            newpart[ptind] = _Point(x, y)
         newparts.append(newpart)
 
     return arcpy.Geometry(geom.type, arcpy.Array(newparts), geom.spatialReference)
@@ -88,10 +103,12 @@ def scale_fc(input_fc, output_fc, scale_factor):
     """
     # Get the fields to include in the output
     fields = arcpy.ListFields(input_fc)
-    field_names = [field.name for field in fields if field.type not in ("OID", "Geometry") and not field.required]
+    keep_fields = [field for field in fields if field.type not in ("OID", "Geometry") and not field.required]
+    field_names = [field.name for field in keep_fields]
 
     out_gdb, out_name = os.path.split(output_fc)
-    spatial_ref = arcpy.Describe(input_fc).spatialReference
+    desc = arcpy.Describe(input_fc)
+    spatial_ref = desc.spatialReference
         
     arcpy.management.CreateFeatureclass(out_path=out_gdb,
                                         out_name=out_name,
@@ -99,32 +116,39 @@ def scale_fc(input_fc, output_fc, scale_factor):
                                         spatial_reference=spatial_ref)
 
 
-    # Add fields from input_fc to output_fc
-    for field in fields:
-        if field.name in field_names:
-            arcpy.AddField_management(output_fc, field.name, field.type, 
-                                        field.precision, field.scale, field.length)
+    # Add fields from input_fc to output_fc in one schema edit
+    field_description = [[field.name, _FIELD_TYPES.get(field.type, field.type), field.aliasName, field.length, "", ""]
+                         for field in keep_fields]
+    if field_description:
+        arcpy.management.AddFields(output_fc, field_description)
 
     # Prepare field mapping for cursor use
     input_fields = ["SHAPE@"] + field_names
     output_fields = ["SHAPE@"] + field_names
 
-    
-    with arcpy.da.SearchCursor(input_fc, input_fields) as search_cursor, \
+    # The edit session needs the workspace, which is one level up if the output is in a feature dataset
+    out_desc = arcpy.Describe(out_gdb)
+    out_workspace = out_desc.path if out_desc.dataType == "FeatureDataset" else out_gdb
+
+    # Write all features in a single edit session so the inserts are committed together
+    with arcpy.da.Editor(out_workspace), \
+    arcpy.da.SearchCursor(input_fc, input_fields) as search_cursor, \
     arcpy.da.InsertCursor(output_fc, output_fields) as insert_cursor:
         for row in search_cursor:
-            scaled_geom = scale_geom(row[0], scale_factor)
-            insert_cursor.insertRow([scaled_geom] + list(row[1:]))
+            insert_cursor.insertRow((scale_geom(row[0], scale_factor),) + row[1:])
             
 
-def table_to_data_frame(in_table, input_fields=None, where_clause=None):
+def table_to_data_frame(in_table, input_fields=None, where_clause=None, null_value=-9999):
     """Function will convert an arcgis table into a pandas dataframe with an object ID index, and the selected
-    input fields using an arcpy.da.SearchCursor.
+    input fields using arcpy.da.TableToNumPyArray.
 
     Parameters:
         in_table (str): The path to a non-spatial table in a .gdb
-        input_fields (list): List of input fields within "in_table" to convert to DataFrame. Default is all fields.
+        input_fields (list): List of input fields within "in_table" to convert to DataFrame. Default is all fields
+            that TableToNumPyArray can read (Raster, Blob and Geometry fields are skipped).
         where_clause (str): SQL query to convert rows only matching the query
+        null_value: Value (or dict of field name to value) substituted for nulls, which NumPy arrays cannot hold.
+            Nulls come back as -9999 by default, not NaN/None.
 
     Outputs:
 
@@ -133,9 +157,10 @@ def table_to_data_frame(in_table, input_fields=None, where_clause=None):
     if input_fields:
         final_fields = [OIDFieldName] + input_fields
     else:
-        final_fields = [field.name for field in arcpy.ListFields(in_table)]
-    data = [row for row in arcpy.da.SearchCursor(in_table, final_fields, where_clause=where_clause)]
-    fc_dataframe = pd.DataFrame(data, columns=final_fields)
+        final_fields = [field.name for field in arcpy.ListFields(in_table)
+                        if field.type not in ("Raster", "Blob", "Geometry")]
+    arr = arcpy.da.TableToNumPyArray(in_table, final_fields, where_clause=where_clause, null_value=null_value)
+    fc_dataframe = pd.DataFrame.from_records(arr)
     fc_dataframe = fc_dataframe.set_index(OIDFieldName, drop=True)
     return fc_dataframe
 
@@ -23,10 +23,13 @@ import time
 import datetime
 import arcgis
 from arcgis.gis import GIS
-from arcgis.features import FeatureLayer
 import zipfile
-import json
+import tempfile
+import orjson
+import shelve
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Please provide ArcGIS Online credentials
@@ -47,6 +50,9 @@ fs_dict = {"Points_of_Interest" : "https://services1.arcgis.com/2exN3kG1f2h7coIQ
             "elte_nht_100k_line": "https://services1.arcgis.com/2exN3kG1f2h7coIQ/arcgis/rest/services/elte_nht_100k_line/FeatureServer",
             "test_attachment_feature_class" : "https://services1.arcgis.com/2exN3kG1f2h7coIQ/arcgis/rest/services/test_attachment_feature_class/FeatureServer"}
 
+# Modified dates checked less than this many seconds ago are reused instead of asking ArcGIS Online again.
+modified_date_cache_ttl = 5 * 60
+
 
 log_file_path = os.path.join(workspace_path, "backup_script_log.txt")
 
@@ -61,52 +67,61 @@ def update_last_modified_and_backup(username, password, fs_dict, last_modified_f
     # Login to ArcGIS Online
     gis = GIS("https://www.arcgis.com", username, password)
 
+    # Each FeatureLayerCollection fetches the service metadata from AGOL, so only build one per url.
+    flc_cache = {}
+
+    def _flc(url):
+        if url not in flc_cache:
+            flc_cache[url] = arcgis.features.FeatureLayerCollection(url, gis)
+        return flc_cache[url]
+
     # Function to access the feature service's last modified date property, if it exists. 
-    def get_layer_modified_date(layer, gis):
+    def get_layer_modified_date(layer):
         try:
-            flayer_collection = arcgis.features.FeatureLayerCollection(layer['url'], gis)
-            flayer = FeatureLayer(flayer_collection.layers[0].url)
-            return datetime.datetime.fromtimestamp(flayer.properties['editingInfo']['lastEditDate']/1000)
+            flc = _flc(layer['url'])
+            # The service metadata fetched with the FeatureLayerCollection normally includes the last edit date,
+            # so the layer endpoint is only requested when it doesn't.
+            editing_info = flc.properties.get('editingInfo') or flc.layers[0].properties['editingInfo']
+            return datetime.datetime.fromtimestamp(editing_info['lastEditDate']/1000)
         except Exception as e:
             logging.info(f"Error getting modified date for layer {layer['title']}: {str(e)}")
             return None
     
-    # Function to download a hosted feature service layer in GDB format
+    # Function to download a hosted feature service layer in GDB format. "mod_date" is a datetime.
     def downloadFS(title, url, workspace_path, mod_date):
         try:
             timestamp = time.strftime("%Y%m%d_%H%M", time.localtime())
-            mod_date = datetime.datetime.strptime(mod_date, '%Y-%m-%d %H:%M:%S')
             mod_date = mod_date.strftime('%Y%m%d_%H%M%S')
             gdb_rename = f"{title.strip()}_{mod_date}_{timestamp}"  
-            feature_service_flc = arcgis.features.FeatureLayerCollection(url, gis)
-            result = feature_service_flc.replicas.create(replica_name='temp',
-                                                         layers='0',
-                                                         data_format='filegdb',
-                                                         out_path = workspace_path,
-                                                         return_attachments=True,
-                                                         attachments_sync_direction='bidirectional')
-            
-            # Create year//layer specific directories
-            year = datetime.datetime.now().strftime("%Y")
-            layer_dir = os.path.join(workspace_path,year,title)
+            feature_service_flc = _flc(url)
             
-            if not os.path.exists(layer_dir):
-                os.makedirs(layer_dir)
-            
-            # Path of downloaded zip folder
-            path = os.path.realpath(result)
-            myzip = zipfile.ZipFile(str(path), 'r')
-            # Get names of content in zipfile
-            zipPath = zipfile.ZipFile.namelist(myzip)
-            # Get the randomized GDB name from the zip folder
-            gdbName = os.path.dirname(zipPath[0])
-            # Extract zip archive
-            myzip.extractall(layer_dir)
-            # Rename GDB to an identifiable name
-            os.rename(os.path.join(layer_dir, gdbName), os.path.join(layer_dir, gdb_rename + ".gdb"))
-            # Close zip archive in order to delete
-            myzip.close()
-            os.remove(myzip.filename)
+            # Download the replica zip to a temporary folder so it never lands on the backup drive.
+            # The folder and zip are removed when the "with" block exits.
+            with tempfile.TemporaryDirectory() as download_dir:
+                result = feature_service_flc.replicas.create(replica_name='temp',
+                                                             layers='0',
+                                                             data_format='filegdb',
+                                                             out_path = download_dir,
+                                                             return_attachments=True,
+                                                             attachments_sync_direction='bidirectional')
+                
+                # Create year//layer specific directories
+                year = datetime.datetime.now().strftime("%Y")
+                layer_dir = os.path.join(workspace_path,year,title)
+                
+                if not os.path.exists(layer_dir):
+                    os.makedirs(layer_dir)
+                
+                # Path of downloaded zip folder
+                path = os.path.realpath(result)
+                with zipfile.ZipFile(str(path), 'r') as myzip:
+                    members = myzip.infolist()
+                    # Get the randomized GDB name from the zip folder
+                    gdbName = os.path.dirname(members[0].filename)
+                    # Extract each entry straight into the identifiably named GDB instead of extracting then renaming
+                    for info in members:
+                        info.filename = info.filename.replace(gdbName, gdb_rename + ".gdb", 1)
+                        myzip.extract(info, layer_dir)
             logging.info(f"{title} was backed up.")
             return True 
         except Exception as e:
@@ -116,57 +131,99 @@ def update_last_modified_and_backup(username, password, fs_dict, last_modified_f
     # Initialize a dictionary to store the layer's name as key and the layer's most recent modified date as value
     # Only values successfully obtained via the "get_layer_modified_date" function will be put into the dict.
     last_modified_dates = {}
+    # The same dates as datetimes (to the second, matching the JSON), so they are only converted once.
+    parsed_new = {}
 
     # If the edit properties cannot be accessed, the name and url of the feature service will be stored here.  
     error_layers = {}
     
+    date_format = '%Y-%m-%d %H:%M:%S'
+
+    # Both steps are dominated by waiting on ArcGIS Online, so the layers are processed concurrently.
+    max_workers = max(1, min(8, len(fs_dict)))
+
     # Adds each feature service to its respective dictionary based on whether a date was retrieved or not. 
-    for fs_name, fs_url in fs_dict.items():
-        modified_date = get_layer_modified_date({'title': fs_name, 'url': fs_url}, gis)
+    # Dates checked within the last "modified_date_cache_ttl" seconds are reused from the local cache instead of asking AGOL again.
+    with shelve.open(os.path.join(workspace_path, ".modcache")) as cache:
+        now = time.time()
+        modified_dates = {}
+        for fs_name, fs_url in fs_dict.items():
+            cached = cache.get(fs_url)
+            if cached and now - cached[0] < modified_date_cache_ttl:
+                modified_dates[fs_name] = datetime.datetime.fromisoformat(cached[1])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            date_futures = {fs_name: executor.submit(get_layer_modified_date, {'title': fs_name, 'url': fs_url})
+                            for fs_name, fs_url in fs_dict.items() if fs_name not in modified_dates}
+        for fs_name, future in date_futures.items():
+            modified_dates[fs_name] = future.result()
+            if modified_dates[fs_name]:
+                cache[fs_dict[fs_name]] = (time.time(), modified_dates[fs_name].isoformat())
+
+    for fs_name in fs_dict:
+        modified_date = modified_dates[fs_name]
         
         if modified_date:
-            last_modified_dates[fs_name] = modified_date.strftime('%Y-%m-%d %H:%M:%S')
+            parsed_new[fs_name] = modified_date.replace(microsecond=0)
+            last_modified_dates[fs_name] = parsed_new[fs_name].strftime(date_format)
         else:
-            error_layers[fs_name] = fs_url
+            error_layers[fs_name] = fs_dict[fs_name]
     if len(error_layers) > 0:
         logging.info(f"The last modified dates of the following layers could not be accessed: {error_layers}")
     
     # Dictionary to store the titles and dates that will go into the JSON. Dates will only be updated if "downloadFS()" successfully runs on the feature service.   
     existing_data = {}
+    existing_data_lock = threading.Lock()
+
+    # Runs "downloadFS()" and records the new date if it succeeds, otherwise falls back to the previous date (if any).
+    def backup_layer(fs_title, new_date, existing_date):
+        backed_up = downloadFS(fs_title, fs_dict[fs_title], workspace_path, parsed_new[fs_title])
+        with existing_data_lock:
+            if backed_up:
+                existing_data[fs_title] = new_date
+            elif existing_date:
+                existing_data[fs_title] = existing_date
+            else:
+                existing_data.pop(fs_title, None)
     
+    backup_futures = []
+
     if os.path.exists(last_modified_file):
         
-        with open(last_modified_file, 'r') as file:
-            existing_data = json.load(file)  
-
-        for fs_title, new_date in last_modified_dates.items():
-            existing_date = existing_data.get(fs_title)
-            current_url = fs_dict.get(fs_title)
-            if not existing_date:
-                logging.info(f"{fs_title} has no existing backup. It will be backed up now.")
-            elif datetime.datetime.strptime(new_date, '%Y-%m-%d %H:%M:%S') > datetime.datetime.strptime(existing_date, '%Y-%m-%d %H:%M:%S'):
-                logging.info(f"{fs_title} has been modified since the last backup. {existing_date} --> {new_date}")
-
-            if not existing_date or datetime.datetime.strptime(new_date, '%Y-%m-%d %H:%M:%S') > datetime.datetime.strptime(existing_date, '%Y-%m-%d %H:%M:%S'):          
-                if downloadFS(fs_title, current_url, workspace_path, new_date):
-                    existing_data[fs_title] = new_date
+        with open(last_modified_file, 'rb') as file:
+            existing_data = orjson.loads(file.read())
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for fs_title, new_date in last_modified_dates.items():
+                existing_date = existing_data.get(fs_title)
+                if not existing_date:
+                    logging.info(f"{fs_title} has no existing backup. It will be backed up now.")
+                    modified = True
                 else:
-                    if existing_date:
-                        existing_data[fs_title] = existing_date
-            else:
-                logging.info(f"We don't need to back up {fs_title}")
+                    modified = parsed_new[fs_title] > datetime.datetime.strptime(existing_date, date_format)
+                    if modified:
+                        logging.info(f"{fs_title} has been modified since the last backup. {existing_date} --> {new_date}")
+
+                if modified:
+                    backup_futures.append(executor.submit(backup_layer, fs_title, new_date, existing_date))
+                else:
+                    logging.info(f"We don't need to back up {fs_title}")
     else:
          # if the file does not exist, all layers from the fs_dict dictionary will be backed up.
         logging.info("An existing JSON log does not exist. It will be created following backup of all layers.")
         existing_data = last_modified_dates.copy()
-        for fs_title, new_date in last_modified_dates.items():
-            logging.info(f"{fs_title} does not have an existing backup and will be backed up.")
-            if not downloadFS(fs_title, fs_dict[fs_title], workspace_path, new_date):
-                existing_data.pop(fs_title)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for fs_title, new_date in last_modified_dates.items():
+                logging.info(f"{fs_title} does not have an existing backup and will be backed up.")
+                backup_futures.append(executor.submit(backup_layer, fs_title, new_date, None))
     
+    # Re-raise anything that went wrong in a backup thread rather than writing the log as if it succeeded
+    for future in backup_futures:
+        future.result()
+
     # Update the backup log JSON file. Dates will only be updated if the data successfully backed up. 
-    with open(last_modified_file, "w") as file:
-         json.dump(existing_data, file, indent=4)
+    with open(last_modified_file, "wb") as file:
+         file.write(orjson.dumps(existing_data, option=orjson.OPT_INDENT_2))
             
 
     logging.info(f"The backup log '{last_modified_file}' has been updated and all modified data has been backed up.")
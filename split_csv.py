@@ -1,36 +1,84 @@
 import csv
 import os
+from itertools import islice
 
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
-def split_csv(input_file, output_dir, base_name, chunk_size=50000):
-    os.makedirs(output_dir, exist_ok=True)
-    with open(input_file, mode="r", newline="", encoding="utf-8") as infile:
+# Size of each block pyarrow parses (in parallel) from the input file
+BLOCK_SIZE = 32 << 20
+
+
+def _arrow_batches(input_file, header, chunk_size):
+    """Yields lists of chunk_size rows parsed (in parallel) by pyarrow. Raises pa.ArrowInvalid on ragged rows."""
+    # Read every column as text (and leave blanks alone) so values are written back out unchanged
+    convert_options = pacsv.ConvertOptions(column_types={name: pa.string() for name in header},
+                                           strings_can_be_null=False,
+                                           quoted_strings_can_be_null=False)
+    # Blank lines are kept so they fail the column count (and fall back) rather than being dropped
+    reader = pacsv.open_csv(input_file,
+                            read_options=pacsv.ReadOptions(block_size=BLOCK_SIZE),
+                            parse_options=pacsv.ParseOptions(newlines_in_values=True, ignore_empty_lines=False),
+                            convert_options=convert_options)
+
+    def to_rows(table):
+        return list(zip(*(column.to_pylist() for column in table.columns)))
+
+    # Accumulate parsed batches and hand back exactly chunk_size rows at a time
+    pending = []
+    pending_rows = 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield to_rows(table.slice(0, chunk_size))
+            rest = table.slice(chunk_size)
+            pending = rest.to_batches()
+            pending_rows = rest.num_rows
+    if pending_rows:
+        yield to_rows(pa.Table.from_batches(pending))
+
+def _csv_batches(input_file, chunk_size):
+    """Yields lists of chunk_size rows read with the csv module, which accepts ragged rows and blank lines."""
+    with open(input_file, mode="r", newline="", encoding="utf-8-sig") as infile:
         reader = csv.reader(infile)
-        header=next(reader)
+        next(reader)
+        yield from iter(lambda: list(islice(reader, chunk_size)), [])
 
-        file_count = 1
-        row_count = 0
+def split_csv(input_file, output_dir, base_name, chunk_size=50000):
+    os.makedirs(output_dir, exist_ok=True)
+    # utf-8-sig drops a leading BOM (as Arrow does) so the first name matches the parsed column
+    with open(input_file, mode="r", newline="", encoding="utf-8-sig") as infile:
+        header = next(csv.reader(infile))
 
-        # construct the path for the first output file
+    # Arrow's writer quotes every string value, so rows are written with csv.writer
+    # to keep minimal quoting and \r\n line endings.
+    def write_chunk(file_count, rows):
         out_path = os.path.join(output_dir, f"{base_name}_{file_count}.csv")
-        outfile = open(out_path, mode="w", newline="", encoding="utf-8")
-        writer = csv.writer(outfile)
-
-        # Write the header to the first file
-        writer.writerow(header)
-
-        for row in reader:
-            if row_count >= chunk_size:
-                # Close the current file and start a new one with header
-                outfile.close()
-                file_count += 1
-                row_count = 0
-                out_path = os.path.join(output_dir, f"{base_name}_{file_count}.csv")
-                outfile = open(out_path, mode="w", newline="", encoding="utf-8")
-                writer = csv.writer(outfile)
-                writer.writerow(header)
-            writer.writerow(row)
-            row_count += 1
+        with open(out_path, mode="w", newline="", encoding="utf-8") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def write_chunks(batches):
+        file_count = 0
+        for rows in batches:
+            file_count += 1
+            write_chunk(file_count, rows)
+        if file_count == 0:
+            # A header-only input still gets a first file containing the header
+            file_count = 1
+            write_chunk(file_count, [])
+        return file_count
+
+    try:
+        file_count = write_chunks(_arrow_batches(input_file, header, chunk_size))
+    except pa.ArrowInvalid as e:
+        # Rows with a different number of columns (or blank lines) can't be parsed by pyarrow.
+        # Start over with the csv module, which overwrites any files already written.
+        print(f"pyarrow could not parse '{input_file}' ({e}). Splitting with the csv module instead.")
+        file_count = write_chunks(_csv_batches(input_file, chunk_size))
     print(f"CSV file split into {file_count} files in '{output_dir}'.")
 
 def main():